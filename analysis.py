@@ -18,9 +18,17 @@ The resulting PNG is saved under outputs/analysis/four_city_delay_comparison.png
 import os
 from typing import Tuple
 
-import numpy as np
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
 import pandas as pd
 
+from summary_io import load_xy
+
+plt.rcParams["path.simplify"] = True
+plt.rcParams["agg.path.chunksize"] = 10000
+
 
 def ensure_parent(path: str) -> None:
     directory = os.path.dirname(os.path.abspath(path))
@@ -28,33 +36,9 @@ def ensure_parent(path: str) -> None:
         os.makedirs(directory, exist_ok=True)
 
 
-def _detect_mean_column(df: pd.DataFrame) -> str:
-    if "mean_delay_s" in df.columns:
-        return "mean_delay_s"
-    if "mean_delta_s" in df.columns:
-        return "mean_delta_s"
-    raise SystemExit("Neither 'mean_delay_s' nor 'mean_delta_s' present in summary sheet")
-
-
 def read_summary_series(path: str, value_column: str = "value") -> Tuple[pd.Series, pd.Series]:
-    df = pd.read_excel(path, sheet_name="summary")
-    if value_column not in df.columns:
-        raise SystemExit(f"Missing column '{value_column}' in summary of {path}")
-    mean_column = _detect_mean_column(df)
-
-    data = df[[value_column, mean_column]].copy()
-    data[value_column] = pd.to_numeric(data[value_column], errors="coerce")
-    data[mean_column] = pd.to_numeric(data[mean_column], errors="coerce")
-    data = data.dropna(subset=[value_column, mean_column])
-    data = data.sort_values(value_column)
-
-    x_vals = data[value_column].astype(float) * 2.0
-    y_vals = data[mean_column].astype(float)
-
-    # Ensure log-scale safety: drop non-positive values
-    y_vals = y_vals.where(y_vals > 0, np.nan)
-
-    return x_vals, y_vals
+    x, y = load_xy(path, os.path.getmtime(path), value_column)
+    return pd.Series(x), pd.Series(y)
 
 
 def plot_city(ax, city_name: str, tripinfo_path: str, stopinfo_path: str) -> None:
@@ -85,8 +69,6 @@ def main() -> None:
     brest_trip = r"C:\Users\RPC\Desktop\sumo_automation\brest_sumo_case\outputs\analysis\pt_delay_old_method.xlsx"
     brest_stop = r"C:\Users\RPC\Desktop\sumo_automation\brest_sumo_case\outputs\analysis\pt_delay_analysis.xlsx"
 
-    import matplotlib.pyplot as plt
-
     fig, axes = plt.subplots(2, 2, figsize=(14, 10))
     axes = axes.ravel()
 
@@ -12,12 +12,15 @@ Assumptions:
 """
 
 import csv
+import itertools
+import math
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Tuple
 
-import numpy as np
-import xml.etree.ElementTree as ET
+import pandas as pd
+import xml.sax
 
 
 def ensure_parent(path: str) -> None:
@@ -26,37 +29,51 @@ def ensure_parent(path: str) -> None:
         os.makedirs(directory, exist_ok=True)
 
 
-def parse_tripinfo_durations(xml_path: str) -> List[float]:
-    """Stream-parse a SUMO tripinfo.xml file and collect duration values (seconds)."""
+class _TripinfoDurationHandler(xml.sax.ContentHandler):
+    """SAX handler that accumulates running statistics of <tripinfo> durations.
+
+    Uses Welford's online update, so memory stays constant regardless of file size.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def startElement(self, name, attrs) -> None:
+        if name == "tripinfo":
+            duration_str = attrs.get("duration")
+            if duration_str is not None:
+                try:
+                    duration = float(duration_str)
+                except ValueError:
+                    return
+                self.count += 1
+                delta = duration - self.mean
+                self.mean += delta / self.count
+                self.m2 += delta * (duration - self.mean)
+
+
+def compute_stats(handler: _TripinfoDurationHandler) -> Tuple[int, float, float]:
+    """Return count, mean, std (population) accumulated by the handler. Empty -> zeros."""
+    if handler.count == 0:
+        return 0, 0.0, 0.0
+    return handler.count, handler.mean, math.sqrt(handler.m2 / handler.count)
+
+
+def parse_tripinfo_stats(xml_path: str) -> Tuple[int, float, float]:
+    """Stream-parse a SUMO tripinfo.xml file and return count, mean, std of durations (seconds)."""
     if not os.path.exists(xml_path):
         raise FileNotFoundError(f"Missing tripinfo file: {xml_path}")
 
-    durations: List[float] = []
+    handler = _TripinfoDurationHandler()
     try:
-        for _event, elem in ET.iterparse(xml_path, events=("end",)):
-            if elem.tag == "tripinfo":
-                duration_str = elem.get("duration")
-                if duration_str is not None:
-                    try:
-                        durations.append(float(duration_str))
-                    except ValueError:
-                        pass
-                elem.clear()
-    except ET.ParseError as exc:
+        xml.sax.parse(xml_path, handler)
+    except xml.sax.SAXParseException as exc:
         raise SystemExit(f"XML parse error in {xml_path}: {exc}")
 
-    return durations
-
-
-def compute_stats(values: List[float]) -> Tuple[int, float, float]:
-    """Return count, mean, std (population) for a list of floats. Empty -> zeros."""
-    if not values:
-        return 0, 0.0, 0.0
-    arr = np.asarray(values, dtype=float)
-    count = int(arr.size)
-    mean = float(np.mean(arr))
-    std = float(np.std(arr, ddof=0))  # population std
-    return count, mean, std
+    return compute_stats(handler)
 
 
 def count_unique_routes(routes_path: str) -> int:
@@ -70,22 +87,17 @@ def count_unique_routes(routes_path: str) -> int:
     unique_ids = set()
     try:
         with open(routes_path, "r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
+            reader = csv.reader(f)
+            header = next(reader, [])
             # If header has route_id, use it; else fallback to first column as route_id
-            if reader.fieldnames and any(name.strip().lower() == "route_id" for name in reader.fieldnames):
-                for row in reader:
-                    route_id = (row.get("route_id") or "").strip()
-                    if route_id:
-                        unique_ids.add(route_id)
-            else:
-                f.seek(0)
-                simple_reader = csv.reader(f)
-                for idx, parts in enumerate(simple_reader):
-                    if idx == 0 and parts and any(token.lower() == "route_id" for token in parts):
-                        continue
-                    if not parts:
-                        continue
-                    route_id = (parts[0] or "").strip()
+            idx = next((i for i, name in enumerate(header) if name.strip().lower() == "route_id"), None)
+            if idx is None:
+                idx = 0
+                if header:
+                    reader = itertools.chain([header], reader)
+            for row in reader:
+                if len(row) > idx:
+                    route_id = row[idx].strip()
                     if route_id and route_id.lower() != "route_id":
                         unique_ids.add(route_id)
     except Exception:
@@ -112,22 +124,24 @@ def main() -> None:
 
     results: List[Tuple[str, int, float, float, int]] = []
 
+    # The tripinfo files are independent, so parse them in parallel
+    with ProcessPoolExecutor(max_workers=min(4, len(city_to_path))) as executor:
+        futures = {city: executor.submit(parse_tripinfo_stats, path) for city, path in city_to_path.items()}
+        stats_by_city = {city: future.result() for city, future in futures.items()}
+
     print("City | Count | Average(s) | StdDev(s) | Routes")
     print("-----|-------|------------|-----------|--------")
-    for city, path in city_to_path.items():
-        durations = parse_tripinfo_durations(path)
-        count, mean, std = compute_stats(durations)
+    for city in city_to_path:
+        count, mean, std = stats_by_city[city]
         routes_count = count_unique_routes(city_to_routes.get(city, ""))
         results.append((city, count, mean, std, routes_count))
         print(f"{city} | {count} | {mean:.2f} | {std:.2f} | {routes_count}")
 
     out_csv = os.path.join("outputs", "analysis", "pt_tripinfo_stats.csv")
     ensure_parent(out_csv)
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["city", "count", "mean_s", "std_s", "num_routes"])
-        for city, count, mean, std, routes_count in results:
-            writer.writerow([city, count, f"{mean:.6f}", f"{std:.6f}", routes_count])
+    pd.DataFrame(results, columns=["city", "count", "mean_s", "std_s", "num_routes"]).to_csv(
+        out_csv, index=False, float_format="%.6f", encoding="utf-8"
+    )
 
     print(f"Saved: {os.path.abspath(out_csv)}")
 
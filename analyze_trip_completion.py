@@ -9,12 +9,53 @@ This script analyzes tripinfo.xml files to determine:
 """
 
 import os
-import xml.etree.ElementTree as ET
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Tuple, List
+from typing import Dict, Iterator, Tuple, List
 import pandas as pd
 import numpy as np
 
+# Prefer lxml (C-backed iterparse with tag filtering) when available
+try:
+    import lxml.etree as ET  # type: ignore
+    _HAS_LXML = True
+except Exception:  # pragma: no cover
+    import xml.etree.ElementTree as ET  # type: ignore
+    _HAS_LXML = False
+
+# lxml parser options for large SUMO files: skip entity resolution and blank text nodes
+_LXML_PARSER_OPTIONS = dict(huge_tree=True, remove_blank_text=True, resolve_entities=False)
+
+# Maximum number of rows printed per results table
+PREVIEW_ROWS = 40
+
+# Simulation output filenames: <scenario>_<traffic_level>_<sim_number>_<City>_sim_output.xml
+SIM_OUTPUT_RE = re.compile(r'^\d+_(\d+)_\d+_.*_sim_output\.xml$')
+
+def _iter_tripinfo_attrs(tripinfo_path: str) -> Iterator[Tuple[str, str, str, str]]:
+    """
+    Stream (arrival, duration, vType, vaporized) for every <tripinfo> in a tripinfo.xml file.
+    
+    Uses iterparse, discarding each element after use so memory stays constant
+    regardless of file size. Missing attributes fall back to defaults so that
+    incomplete trips are still counted.
+    """
+    if _HAS_LXML:
+        context = ET.iterparse(tripinfo_path, events=('end',), tag='tripinfo', **_LXML_PARSER_OPTIONS)
+    else:
+        context = ET.iterparse(tripinfo_path, events=('end',))
+    
+    for _, elem in context:
+        if elem.tag != 'tripinfo':
+            continue
+        yield elem.get('arrival', ''), elem.get('duration', '0'), elem.get('vType', ''), elem.get('vaporized', '')
+        elem.clear()
+        if _HAS_LXML:
+            # Drop already-processed siblings still referenced by the root
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
 def analyze_trip_completion_by_type(tripinfo_path: str) -> Tuple[int, int, int, int, float, float]:
     """
     Analyze trip completion from a tripinfo.xml file, separating public transport and private vehicles.
@@ -25,54 +66,42 @@ def analyze_trip_completion_by_type(tripinfo_path: str) -> Tuple[int, int, int,
     Returns:
         Tuple of (pt_complete, pt_incomplete, pv_complete, pv_incomplete, pt_percentage, pv_percentage)
     """
+    arrivals = []
+    durations = []
+    vtypes = []
+    vaporized = []
+    
     try:
-        tree = ET.parse(tripinfo_path)
-        root = tree.getroot()
+        for arrival, duration, vtype, vap in _iter_tripinfo_attrs(tripinfo_path):
+            arrivals.append(arrival)
+            durations.append(duration)
+            vtypes.append(vtype)
+            vaporized.append(vap)
     except Exception as e:
         print(f"Error parsing {tripinfo_path}: {e}")
         return 0, 0, 0, 0, 0.0, 0.0
     
-    pt_complete = 0
-    pt_incomplete = 0
-    pv_complete = 0
-    pv_incomplete = 0
+    # A trip is complete if it was not vaporized (method 1), has an arrival time
+    # (method 2) and has a valid positive duration (method 3)
+    duration_values = pd.to_numeric(pd.Series(durations, dtype=object), errors='coerce').to_numpy(dtype=float)
+    is_complete = (
+        (np.array(vaporized, dtype=str) != 'true')
+        & (np.array(arrivals, dtype=str) != '')
+        & (duration_values > 0)
+    )
     
-    for tripinfo in root.findall('.//tripinfo'):
-        # Check if trip is complete
-        is_complete = True
-        
-        # Method 1: Check if vaporized
-        vaporized = tripinfo.get('vaporized', '')
-        if vaporized == 'true':
-            is_complete = False
-        
-        # Method 2: Check if arrival time exists
-        arrival = tripinfo.get('arrival', '')
-        if not arrival or arrival == '':
-            is_complete = False
-        
-        # Method 3: Check if duration is valid
-        duration = tripinfo.get('duration', '0')
-        try:
-            if float(duration) <= 0:
-                is_complete = False
-        except (ValueError, TypeError):
-            is_complete = False
-        
-        # Determine if it's public transport or private vehicle
-        vtype = tripinfo.get('vType', '').lower()
-        is_public_transport = 'bus' in vtype or 'pt' in vtype or 'public' in vtype
-        
-        if is_public_transport:
-            if is_complete:
-                pt_complete += 1
-            else:
-                pt_incomplete += 1
-        else:
-            if is_complete:
-                pv_complete += 1
-            else:
-                pv_incomplete += 1
+    # Determine if it's public transport or private vehicle
+    vtypes_lower = np.char.lower(np.array(vtypes, dtype=str))
+    is_public_transport = (
+        (np.char.find(vtypes_lower, 'bus') >= 0)
+        | (np.char.find(vtypes_lower, 'pt') >= 0)
+        | (np.char.find(vtypes_lower, 'public') >= 0)
+    )
+    
+    pt_complete = int((is_complete & is_public_transport).sum())
+    pt_incomplete = int((~is_complete & is_public_transport).sum())
+    pv_complete = int((is_complete & ~is_public_transport).sum())
+    pv_incomplete = int((~is_complete & ~is_public_transport).sum())
     
     # Calculate percentages
     pt_total = pt_complete + pt_incomplete
@@ -130,31 +159,20 @@ def find_simulation_files(base_dir: str) -> Dict[str, Dict[int, List[str]]]:
             print(f"Warning: {sim_dir} not found")
             continue
         
-        # Find all simulation files directly in sim directory
-        sim_files = []
-        for sim_file in sim_dir.glob("*.xml"):
-            if "sim_output" in sim_file.name:
-                sim_files.append(str(sim_file))
+        # Find all simulation files directly in sim directory and group them by
+        # traffic level parsed from the filename (e.g., "4_10000_1_Debrecen_sim_output.xml")
+        traffic_groups = {}
+        with os.scandir(sim_dir) as entries:
+            for entry in entries:
+                m = SIM_OUTPUT_RE.match(entry.name)
+                if not m:
+                    continue
+                traffic_groups.setdefault(int(m.group(1)), []).append(entry.path)
         
-        if not sim_files:
+        if not traffic_groups:
             print(f"No simulation files found for {city_name}")
             continue
         
-        # Group files by traffic level
-        traffic_groups = {}
-        for sim_file in sim_files:
-            # Parse filename to extract traffic level (e.g., "4_10000_1_Debrecen_sim_output.xml")
-            filename = Path(sim_file).name
-            parts = filename.split('_')
-            if len(parts) >= 2:
-                try:
-                    traffic_level = int(parts[1])  # Second part is traffic level
-                    if traffic_level not in traffic_groups:
-                        traffic_groups[traffic_level] = []
-                    traffic_groups[traffic_level].append(sim_file)
-                except (ValueError, IndexError):
-                    continue
-        
         # Store results
         for traffic_level, files in traffic_groups.items():
             simulation_files[city_name][traffic_level] = files
@@ -180,10 +198,24 @@ def analyze_traffic_levels(base_dir: str = ".") -> None:
         print("No simulation files found!")
         return
     
+    # Files are independent, so analyze them all in a process pool up front
+    all_files = [
+        (city_name, traffic_level, sim_file)
+        for city_name, traffic_levels in simulation_files.items()
+        for traffic_level, sim_files in traffic_levels.items()
+        for sim_file in sim_files
+    ]
+    with ProcessPoolExecutor() as executor:
+        file_results = list(executor.map(analyze_trip_completion_by_type, [f for _, _, f in all_files], chunksize=8))
+    
+    results_by_level: Dict[Tuple[str, int], List[Tuple[int, int, int, int, float, float]]] = {}
+    for (city_name, traffic_level, _), result in zip(all_files, file_results):
+        results_by_level.setdefault((city_name, traffic_level), []).append(result)
+    
     # Results storage
-    pt_results = []  # Public transport results
-    pv_results = []  # Private vehicle results
-    combined_results = []  # Combined results
+    # Long-form results: one row per (city, traffic level, category) where category
+    # is 'pt' (public transport), 'pv' (private vehicles) or 'combined'
+    records = []
     
     for city_name, traffic_levels in simulation_files.items():
         print(f"\nAnalyzing {city_name}...")
@@ -199,12 +231,7 @@ def analyze_traffic_levels(base_dir: str = ".") -> None:
             pv_incomplete_list = []
             pv_percentage_list = []
             
-            for sim_file in sim_files:
-                if not os.path.exists(sim_file):
-                    continue
-                    
-                pt_comp, pt_incomp, pv_comp, pv_incomp, pt_perc, pv_perc = analyze_trip_completion_by_type(sim_file)
-                
+            for pt_comp, pt_incomp, pv_comp, pv_incomp, pt_perc, pv_perc in results_by_level.get((city_name, traffic_level), []):
                 pt_complete_list.append(pt_comp)
                 pt_incomplete_list.append(pt_incomp)
                 pt_percentage_list.append(pt_perc)
@@ -230,60 +257,38 @@ def analyze_traffic_levels(base_dir: str = ".") -> None:
             avg_total_percentage = (avg_total_complete / (avg_total_complete + avg_total_incomplete) * 100) if (avg_total_complete + avg_total_incomplete) > 0 else 0
             
             # Store results
-            pt_results.append({
-                'City': city_name,
-                'Traffic_Level': traffic_level,
-                'Avg_Complete_Trips': avg_pt_complete,
-                'Avg_Incomplete_Trips': avg_pt_incomplete,
-                'Avg_Completion_Percentage': avg_pt_percentage
-            })
-            
-            pv_results.append({
-                'City': city_name,
-                'Traffic_Level': traffic_level,
-                'Avg_Complete_Trips': avg_pv_complete,
-                'Avg_Incomplete_Trips': avg_pv_incomplete,
-                'Avg_Completion_Percentage': avg_pv_percentage
-            })
-            
-            combined_results.append({
-                'City': city_name,
-                'Traffic_Level': traffic_level,
-                'Avg_Complete_Trips': avg_total_complete,
-                'Avg_Incomplete_Trips': avg_total_incomplete,
-                'Avg_Completion_Percentage': avg_total_percentage
-            })
+            records.append((city_name, traffic_level, 'pt', avg_pt_complete, avg_pt_incomplete, avg_pt_percentage))
+            records.append((city_name, traffic_level, 'pv', avg_pv_complete, avg_pv_incomplete, avg_pv_percentage))
+            records.append((city_name, traffic_level, 'combined', avg_total_complete, avg_total_incomplete, avg_total_percentage))
     
     # Create and save results
-    if pt_results:
-        print("\n" + "=" * 80)
-        print("PUBLIC TRANSPORT RESULTS")
-        print("=" * 80)
-        
-        pt_df = pd.DataFrame(pt_results)
-        print(pt_df.to_string(index=False, float_format='%.1f'))
-        pt_df.to_csv("public_transport_completion.csv", index=False)
+    if records:
+        results_df = pd.DataFrame(records, columns=[
+            'City', 'Traffic_Level', 'Category',
+            'Avg_Complete_Trips', 'Avg_Incomplete_Trips', 'Avg_Completion_Percentage'
+        ])
         
-        print("\n" + "=" * 80)
-        print("PRIVATE VEHICLE RESULTS")
-        print("=" * 80)
+        outputs = [
+            ("PUBLIC TRANSPORT RESULTS", 'pt', "public_transport_completion.csv"),
+            ("PRIVATE VEHICLE RESULTS", 'pv', "private_vehicle_completion.csv"),
+            ("COMBINED RESULTS", 'combined', "combined_completion.csv"),
+        ]
         
-        pv_df = pd.DataFrame(pv_results)
-        print(pv_df.to_string(index=False, float_format='%.1f'))
-        pv_df.to_csv("private_vehicle_completion.csv", index=False)
-        
-        print("\n" + "=" * 80)
-        print("COMBINED RESULTS")
-        print("=" * 80)
-        
-        combined_df = pd.DataFrame(combined_results)
-        print(combined_df.to_string(index=False, float_format='%.1f'))
-        combined_df.to_csv("combined_completion.csv", index=False)
+        for title, category, csv_path in outputs:
+            print("\n" + "=" * 80)
+            print(title)
+            print("=" * 80)
+            
+            df = results_df[results_df['Category'] == category].drop(columns='Category')
+            # Only preview the first rows on the console; the CSV holds the full table
+            print(df.head(PREVIEW_ROWS).to_string(index=False, float_format='%.1f'))
+            if len(df) > PREVIEW_ROWS:
+                print(f"... ({len(df) - PREVIEW_ROWS} more rows in {csv_path})")
+            df.to_csv(csv_path, index=False, lineterminator='\n')
         
         print(f"\nResults saved to:")
-        print(f"  - public_transport_completion.csv")
-        print(f"  - private_vehicle_completion.csv") 
-        print(f"  - combined_completion.csv")
+        for _, _, csv_path in outputs:
+            print(f"  - {csv_path}")
 
 if __name__ == "__main__":
     analyze_traffic_levels()
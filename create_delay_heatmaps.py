@@ -11,8 +11,10 @@ For each city, this script:
 The heat maps use color intensity to show delay severity at each stop location.
 """
 
+import argparse
+import json
 import os
-import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Tuple, Optional
 import pandas as pd
@@ -21,6 +23,36 @@ import matplotlib.colors as mcolors
 from matplotlib import cm
 import numpy as np
 
+# Prefer lxml (C-backed iterparse) when available
+try:
+    import lxml.etree as ET  # type: ignore
+    _HAS_LXML = True
+except Exception:  # pragma: no cover
+    import xml.etree.ElementTree as ET  # type: ignore
+    _HAS_LXML = False
+
+# lxml parser options for large SUMO files: skip entity resolution and blank text nodes
+_LXML_PARSER_OPTIONS = dict(huge_tree=True, remove_blank_text=True, resolve_entities=False)
+_ITERPARSE_OPTIONS = _LXML_PARSER_OPTIONS if _HAS_LXML else {}
+
+# Prefer the Rust-based calamine Excel reader when available
+try:
+    import python_calamine  # type: ignore  # noqa: F401
+    _EXCEL_ENGINE = 'calamine'
+except Exception:  # pragma: no cover
+    _EXCEL_ENGINE = 'openpyxl'
+
+# Columns needed from the per-traffic-value sheets
+STOP_DELAY_COLUMNS = {'stop', 'stop_avg_delta_s', 'delay_delta_s'}
+
+
+def _parse_root(path: str):
+    if _HAS_LXML:
+        parser = ET.XMLParser(collect_ids=False, **_LXML_PARSER_OPTIONS)
+        return ET.parse(path, parser=parser).getroot()
+    else:
+        return ET.parse(path).getroot()
+
 
 def parse_stop_locations_from_xml(gtfs_add_path: str, network_path: str) -> Dict[str, Tuple[float, float]]:
     """
@@ -38,37 +70,39 @@ def parse_stop_locations_from_xml(gtfs_add_path: str, network_path: str) -> Dict
     # First, read the network to get lane geometries
     lane_coords = {}
     try:
-        net_tree = ET.parse(network_path)
-        net_root = net_tree.getroot()
-        
-        # Parse lane shapes (they contain the actual coordinates)
-        for edge in net_root.findall('.//edge'):
-            for lane in edge.findall('lane'):
-                lane_id = lane.attrib.get('id')
-                shape = lane.attrib.get('shape')
+        # Stream the network and discard each element once its end tag is seen,
+        # so memory stays bounded even for very large .net.xml files
+        for _, elem in ET.iterparse(network_path, events=('end',), **_ITERPARSE_OPTIONS):
+            # Parse lane shapes (they contain the actual coordinates)
+            if elem.tag == 'lane':
+                lane_id = elem.get('id')
+                shape = elem.get('shape')
                 if lane_id and shape:
-                    # Shape is a space-separated list of "x,y" coordinates
-                    coords = []
-                    for point in shape.split():
-                        if ',' in point:
-                            x, y = point.split(',')
-                            coords.append((float(x), float(y)))
-                    if coords:
-                        # Use midpoint of lane as representative location
-                        mid_idx = len(coords) // 2
-                        lane_coords[lane_id] = coords[mid_idx]
+                    # Shape is a space-separated list of "x,y" coordinates; only the
+                    # midpoint of the lane is used as its representative location,
+                    # so convert just that point instead of the whole shape
+                    points = shape.split()
+                    mid_point = points[len(points) // 2]
+                    if ',' in mid_point:
+                        x, y = mid_point.split(',')[:2]
+                        lane_coords[lane_id] = (float(x), float(y))
+            elem.clear()
+            # Drop already-processed siblings; the root has no parent (its previous
+            # sibling is the top-level "generated on" comment)
+            if _HAS_LXML and elem.getparent() is not None:
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
     except Exception as e:
         print(f"  Warning: Could not parse network file {network_path}: {e}")
         return stop_locations
     
     # Now read the GTFS stops and match them to lane coordinates
     try:
-        stops_tree = ET.parse(gtfs_add_path)
-        stops_root = stops_tree.getroot()
+        stops_root = _parse_root(gtfs_add_path)
         
-        for bus_stop in stops_root.findall('.//busStop'):
-            stop_id = bus_stop.attrib.get('id')
-            lane = bus_stop.attrib.get('lane')
+        for bus_stop in stops_root.iter('busStop'):
+            stop_id = bus_stop.get('id')
+            lane = bus_stop.get('lane')
             
             if stop_id and lane and lane in lane_coords:
                 stop_locations[stop_id] = lane_coords[lane]
@@ -79,6 +113,56 @@ def parse_stop_locations_from_xml(gtfs_add_path: str, network_path: str) -> Dict
     return stop_locations
 
 
+def _normalize_stop_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize the 'stop' column to string IDs, dropping rows without a stop.
+    
+    Integer-valued floats like 15239046.0 become "15239046"; everything else
+    (e.g. 15239046.1 or string IDs) is kept as its string form.
+    """
+    df = df[df['stop'].notna()]
+    stops = df['stop']
+    if pd.api.types.is_float_dtype(stops):
+        is_int_like = stops % 1 == 0
+    else:
+        is_int_like = stops.map(lambda v: isinstance(v, float) and v.is_integer()).astype(bool)
+    normalized = stops.astype(str)
+    normalized[is_int_like] = stops[is_int_like].astype('int64').astype(str)
+    return df.assign(stop=normalized)
+
+
+def _read_sheet_cached(excel_path: str, sheet_name: str, columns) -> pd.DataFrame:
+    """
+    Read the given columns of a workbook sheet, converting it once to a CSV next to the workbook.
+    
+    The CSV ({excel_path}.{sheet_name}.csv) is used instead of the sheet while it is newer
+    than the workbook. Stop IDs are normalized before being written, so they round-trip
+    through the CSV as strings.
+    
+    Args:
+        excel_path: Path to pt_delay.xlsx file
+        sheet_name: Sheet to read
+        columns: Column names to keep (missing columns are ignored)
+    
+    Returns:
+        DataFrame with the available requested columns
+    """
+    csv_path = f"{excel_path}.{sheet_name}.csv"
+    if os.path.exists(csv_path) and os.path.getmtime(csv_path) >= os.path.getmtime(excel_path):
+        return pd.read_csv(csv_path, usecols=lambda c: c in columns, dtype={'stop': str},
+                           keep_default_na=False, na_values=[''])
+    
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, usecols=lambda c: c in columns,
+                       engine=_EXCEL_ENGINE)
+    if 'stop' in df.columns:
+        df = _normalize_stop_ids(df)
+    try:
+        df.to_csv(csv_path, index=False)
+    except OSError as e:
+        print(f"  Warning: Could not write CSV cache {csv_path}: {e}")
+    return df
+
+
 def read_stop_delays_from_excel(excel_path: str, traffic_value: Optional[int] = None) -> Dict[str, float]:
     """
     Read per-stop average delays from the Excel analysis file.
@@ -99,16 +183,16 @@ def read_stop_delays_from_excel(excel_path: str, traffic_value: Optional[int] =
     try:
         # Read summary to find the maximum traffic value if not specified
         if traffic_value is None:
-            summary_df = pd.read_excel(excel_path, sheet_name='summary')
+            summary_df = _read_sheet_cached(excel_path, 'summary', {'value'})
             if 'value' in summary_df.columns and len(summary_df) > 0:
                 traffic_value = int(summary_df['value'].max())
             else:
                 print(f"  Warning: Could not determine max traffic value from summary")
                 return stop_delays
         
-        # Read the specific traffic value sheet
+        # Read the specific traffic value sheet (stop IDs come back normalized)
         sheet_name = str(traffic_value)
-        df = pd.read_excel(excel_path, sheet_name=sheet_name)
+        df = _read_sheet_cached(excel_path, sheet_name, STOP_DELAY_COLUMNS)
         
         if 'stop' not in df.columns:
             print(f"  Warning: 'stop' column not found in sheet {sheet_name}")
@@ -117,29 +201,14 @@ def read_stop_delays_from_excel(excel_path: str, traffic_value: Optional[int] =
         # Check if we have the pre-calculated average, otherwise calculate it
         if 'stop_avg_delta_s' in df.columns:
             # Use pre-calculated average
-            stop_delays_raw = df.groupby('stop')['stop_avg_delta_s'].first().to_dict()
+            stop_delays = df.groupby('stop')['stop_avg_delta_s'].first().to_dict()
         elif 'delay_delta_s' in df.columns:
             # Calculate average from delay_delta_s
-            stop_delays_raw = df.groupby('stop')['delay_delta_s'].mean().to_dict()
+            stop_delays = df.groupby('stop')['delay_delta_s'].mean().to_dict()
         else:
             print(f"  Warning: Neither 'stop_avg_delta_s' nor 'delay_delta_s' found in sheet {sheet_name}")
             return stop_delays
         
-        # Normalize stop IDs (handle numeric and string formats)
-        for stop_id, delay in stop_delays_raw.items():
-            # Convert to string and handle numeric IDs
-            if isinstance(stop_id, float):
-                # Check if it's like 15239046.0 (integer float)
-                if stop_id == int(stop_id):
-                    normalized_id = str(int(stop_id))
-                else:
-                    # It's like 15239046.1, keep one decimal
-                    normalized_id = str(stop_id)
-            else:
-                normalized_id = str(stop_id)
-            
-            stop_delays[normalized_id] = delay
-        
     except Exception as e:
         print(f"  Warning: Error reading Excel {excel_path}: {e}")
         import traceback
@@ -148,6 +217,99 @@ def read_stop_delays_from_excel(excel_path: str, traffic_value: Optional[int] =
     return stop_delays
 
 
+def _source_mtimes(paths: Dict[str, str]) -> Dict[str, Optional[float]]:
+    """Modification times of a city's input files (None for missing files)."""
+    return {
+        key: os.path.getmtime(path) if os.path.exists(path) else None
+        for key, path in sorted(paths.items())
+    }
+
+
+def _load_city_cache(
+    cache_path: Path, key_path: Path, mtimes: Dict[str, Optional[float]]
+) -> Optional[Tuple[Dict[str, Tuple[float, float]], Dict[str, float]]]:
+    """
+    Load cached (stop_locations, stop_delays) if the cache was built from the same input files.
+    
+    Returns:
+        Tuple of (stop_locations, stop_delays), or None if the cache is missing or stale
+    """
+    if not cache_path.exists() or not key_path.exists():
+        return None
+    try:
+        with open(key_path, "r", encoding="utf-8") as f:
+            if json.load(f) != mtimes:
+                return None
+        df = pd.read_parquet(cache_path)
+        located = df[df['has_location'].astype(bool)]
+        with_delay = df[df['has_delay'].astype(bool)]
+        stop_locations = dict(zip(located['stop_id'], zip(located['x'].tolist(), located['y'].tolist())))
+        stop_delays = dict(zip(with_delay['stop_id'], with_delay['delay'].tolist()))
+    except Exception as e:
+        print(f"  Warning: Ignoring unreadable cache {cache_path}: {e}")
+        return None
+    return stop_locations, stop_delays
+
+
+def _save_city_cache(
+    cache_path: Path,
+    key_path: Path,
+    mtimes: Dict[str, Optional[float]],
+    stop_locations: Dict[str, Tuple[float, float]],
+    stop_delays: Dict[str, float]
+) -> None:
+    """Write (stop_locations, stop_delays) as one Parquet table plus a JSON sidecar with the input mtimes."""
+    stop_ids = list(stop_locations) + [stop_id for stop_id in stop_delays if stop_id not in stop_locations]
+    df = pd.DataFrame({
+        'stop_id': pd.Series(stop_ids, dtype=str),
+        'x': pd.Series([stop_locations.get(stop_id, (np.nan, np.nan))[0] for stop_id in stop_ids], dtype=float),
+        'y': pd.Series([stop_locations.get(stop_id, (np.nan, np.nan))[1] for stop_id in stop_ids], dtype=float),
+        'has_location': pd.Series([stop_id in stop_locations for stop_id in stop_ids], dtype=bool),
+        'delay': pd.Series([stop_delays.get(stop_id, np.nan) for stop_id in stop_ids], dtype=float),
+        'has_delay': pd.Series([stop_id in stop_delays for stop_id in stop_ids], dtype=bool),
+    })
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(cache_path, index=False)
+        with open(key_path, "w", encoding="utf-8") as f:
+            json.dump(mtimes, f)
+    except Exception as e:
+        print(f"  Warning: Could not write cache {cache_path}: {e}")
+
+
+def process_city(
+    city_name: str, paths: Dict[str, str], cache_dir: Optional[Path] = None
+) -> Tuple[str, Dict[str, Tuple[float, float]], Dict[str, float]]:
+    """
+    Read stop locations and per-stop delays for one city (no plotting, safe to run in a thread).
+    
+    Args:
+        city_name: Name of the city
+        paths: Dictionary with 'ptstops', 'network' and 'excel' file paths
+        cache_dir: Directory for the on-disk cache; parsed results are reused while the
+            input files' modification times are unchanged (None disables caching)
+    
+    Returns:
+        Tuple of (city_name, stop_locations, stop_delays)
+    """
+    if cache_dir is not None:
+        cache_path = cache_dir / f"{city_name.lower()}.parquet"
+        key_path = cache_dir / f"{city_name.lower()}.json"
+        mtimes = _source_mtimes(paths)
+        cached = _load_city_cache(cache_path, key_path, mtimes)
+        if cached is not None:
+            print(f"  Using cached data for {city_name}")
+            return (city_name,) + cached
+    
+    stop_locations = parse_stop_locations_from_xml(paths["ptstops"], paths["network"])
+    stop_delays = read_stop_delays_from_excel(paths["excel"])
+    
+    # The parsers return {} on failure; don't pin a failed parse in the cache
+    if cache_dir is not None and stop_locations and stop_delays:
+        _save_city_cache(cache_path, key_path, mtimes, stop_locations, stop_delays)
+    return city_name, stop_locations, stop_delays
+
+
 def create_heatmap(
     stop_locations: Dict[str, Tuple[float, float]], 
     stop_delays: Dict[str, float],
@@ -189,7 +351,9 @@ def create_heatmap(
     delays = np.array(delays)
     
     # Create color map: green (low delay) -> yellow -> red (high delay)
-    norm = mcolors.TwoSlopeNorm(vmin=min(delays), vcenter=np.median(delays), vmax=max(delays))
+    delay_min, delay_median, delay_max = np.percentile(delays, [0, 50, 100])
+    delay_mean = delays.mean()
+    norm = mcolors.TwoSlopeNorm(vmin=delay_min, vcenter=delay_median, vmax=delay_max)
     cmap = cm.get_cmap('RdYlGn_r')  # Reverse so red is high
     
     # Create scatter plot with colors based on delay
@@ -201,8 +365,8 @@ def create_heatmap(
         norm=norm,
         s=80,
         alpha=0.7,
-        edgecolors='black',
-        linewidths=0.5
+        linewidths=0,
+        rasterized=True
     )
     
     ax.set_title(f"{city_name}\n({len(delays)} stops)", fontsize=14, fontweight='bold')
@@ -217,13 +381,20 @@ def create_heatmap(
         cbar.set_label('Average Delay (seconds)', fontsize=11)
     
     # Add statistics text box
-    stats_text = f"Mean: {np.mean(delays):.1f}s\nMedian: {np.median(delays):.1f}s\nMax: {np.max(delays):.1f}s"
+    stats_text = f"Mean: {delay_mean:.1f}s\nMedian: {delay_median:.1f}s\nMax: {delay_max:.1f}s"
     ax.text(0.02, 0.98, stats_text, transform=ax.transAxes,
            fontsize=9, verticalalignment='top',
            bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
 
 
 def main():
+    ap = argparse.ArgumentParser()
+    which = ap.add_mutually_exclusive_group()
+    which.add_argument("--combined-only", action="store_true", help="Only create the combined 2x2 figure")
+    which.add_argument("--individual-only", action="store_true", help="Only create the per-city figures")
+    ap.add_argument("--dpi", type=int, default=150, help="Resolution of the saved figures (default: 150)")
+    args = ap.parse_args()
+    
     # Define city configurations
     cities = {
         "Debrecen": {
@@ -255,71 +426,73 @@ def main():
     # Create output directory
     output_dir = Path("outputs/analysis")
     output_dir.mkdir(parents=True, exist_ok=True)
+    cache_dir = output_dir / ".cache"
+    
+    # Parse all cities concurrently (I/O and C-level parsing); plotting stays on
+    # the main thread since matplotlib is not thread-safe
+    print("Reading stop locations and delay data...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda item: process_city(*item, cache_dir=cache_dir), cities.items()))
+    
+    # Parsed (stop_locations, stop_delays) per city, reused for the combined figure
+    city_data = {city_name: (stop_locations, stop_delays) for city_name, stop_locations, stop_delays in results}
+    
+    generated = []
     
     # Create individual heat maps for each city
-    for city_name, paths in cities.items():
-        print(f"\nProcessing {city_name}...")
-        print("-" * 40)
-        
-        # Parse stop locations
-        print("  Reading stop locations...")
-        stop_locations = parse_stop_locations_from_xml(paths["ptstops"], paths["network"])
-        print(f"  Found {len(stop_locations)} stop locations")
-        
-        # Read delay data
-        print("  Reading delay data...")
-        stop_delays = read_stop_delays_from_excel(paths["excel"])
-        print(f"  Found delay data for {len(stop_delays)} stops")
+    if not args.combined_only:
+        for city_name, (stop_locations, stop_delays) in city_data.items():
+            print(f"\nProcessing {city_name}...")
+            print("-" * 40)
+            print(f"  Found {len(stop_locations)} stop locations")
+            print(f"  Found delay data for {len(stop_delays)} stops")
+            
+            # Create individual heat map
+            fig, ax = plt.subplots(figsize=(12, 10), dpi=args.dpi)
+            fig.patch.set_facecolor("white")
+            
+            create_heatmap(stop_locations, stop_delays, city_name, ax, show_colorbar=True)
+            
+            # Save individual figure
+            output_path = output_dir / f"{city_name.lower()}_delay_heatmap.png"
+            fig.savefig(output_path, bbox_inches='tight', dpi=args.dpi, facecolor='white')
+            print(f"  Saved: {output_path}")
+            plt.close(fig)
+            generated.append(output_path.name)
+    
+    # Create combined 2x2 figure
+    if not args.individual_only:
+        print("\n" + "=" * 80)
+        print("Creating combined 2x2 comparison figure...")
+        print("=" * 80)
         
-        # Create individual heat map
-        fig, ax = plt.subplots(figsize=(12, 10), dpi=150)
+        fig, axes = plt.subplots(2, 2, figsize=(18, 16), dpi=100)
         fig.patch.set_facecolor("white")
+        axes = axes.ravel()
         
-        create_heatmap(stop_locations, stop_delays, city_name, ax, show_colorbar=True)
-        
-        # Save individual figure
-        output_path = output_dir / f"{city_name.lower()}_delay_heatmap.png"
-        fig.savefig(output_path, bbox_inches='tight', dpi=150, facecolor='white')
-        print(f"  Saved: {output_path}")
-        plt.close(fig)
-    
-    # Create combined 2x2 figure
-    print("\n" + "=" * 80)
-    print("Creating combined 2x2 comparison figure...")
-    print("=" * 80)
-    
-    fig, axes = plt.subplots(2, 2, figsize=(18, 16), dpi=150)
-    fig.patch.set_facecolor("white")
-    axes = axes.ravel()
-    
-    for idx, (city_name, paths) in enumerate(cities.items()):
-        print(f"  Adding {city_name} to combined figure...")
+        for idx, (city_name, (stop_locations, stop_delays)) in enumerate(city_data.items()):
+            print(f"  Adding {city_name} to combined figure...")
+            
+            create_heatmap(stop_locations, stop_delays, city_name, axes[idx], show_colorbar=True)
         
-        stop_locations = parse_stop_locations_from_xml(paths["ptstops"], paths["network"])
-        stop_delays = read_stop_delays_from_excel(paths["excel"])
+        fig.suptitle("Public Transport Delay Heat Maps by City\n(at Maximum Traffic Level)", 
+                     fontsize=16, fontweight='bold', y=0.995)
+        fig.tight_layout(rect=[0, 0, 1, 0.99])
         
-        create_heatmap(stop_locations, stop_delays, city_name, axes[idx], show_colorbar=True)
-    
-    fig.suptitle("Public Transport Delay Heat Maps by City\n(at Maximum Traffic Level)", 
-                 fontsize=16, fontweight='bold', y=0.995)
-    fig.tight_layout(rect=[0, 0, 1, 0.99])
-    
-    # Save combined figure
-    combined_path = output_dir / "all_cities_delay_heatmap.png"
-    fig.savefig(combined_path, bbox_inches='tight', dpi=150, facecolor='white')
-    print(f"\nSaved combined figure: {combined_path}")
-    plt.close(fig)
+        # Save combined figure
+        combined_path = output_dir / "all_cities_delay_heatmap.png"
+        fig.savefig(combined_path, bbox_inches='tight', dpi=args.dpi, facecolor='white')
+        print(f"\nSaved combined figure: {combined_path}")
+        plt.close(fig)
+        generated.append(combined_path.name)
     
     print("\n" + "=" * 80)
     print("HEAT MAP GENERATION COMPLETE!")
     print("=" * 80)
     print(f"\nOutput files saved in: {output_dir.absolute()}")
     print("\nGenerated files:")
-    print("  - debrecen_delay_heatmap.png")
-    print("  - pécs_delay_heatmap.png")
-    print("  - szeged_delay_heatmap.png")
-    print("  - brest_delay_heatmap.png")
-    print("  - all_cities_delay_heatmap.png")
+    for name in generated:
+        print(f"  - {name}")
 
 
 if __name__ == "__main__":
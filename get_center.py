@@ -1,21 +1,23 @@
-import xml.etree.ElementTree as ET
+try:
+    import lxml.etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 def find_average_center(input_file):
-    tree = ET.parse(input_file)
-    root = tree.getroot()
-
-    x_sum = 0
-    y_sum = 0
+    x_sum = 0.0
+    y_sum = 0.0
     count = 0
 
-    for edge in root.findall('edge'):
-        if 'shape' in edge.attrib:
-            shape = edge.attrib['shape'].split()
-            coords = [tuple(map(float, coord.split(','))) for coord in shape]
-            x, y = coords[0]
-            x_sum += x
-            y_sum += y
-            count += 1
+    # Stream the network; only the first coordinate of each edge shape is needed
+    for _, elem in ET.iterparse(input_file, events=('end',)):
+        if elem.tag == 'edge':
+            shape = elem.get('shape')
+            if shape:
+                x, y = shape.split(maxsplit=1)[0].split(',')[:2]
+                x_sum += float(x)
+                y_sum += float(y)
+                count += 1
+        elem.clear()
 
     avg_x = x_sum / count
     avg_y = y_sum / count
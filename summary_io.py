@@ -0,0 +1,109 @@
+"""
+Shared loader for the 'summary' sheet of the pt_delay Excel workbooks.
+
+Returns (value × 2, mean delay) as sorted float arrays. Results are cached in two
+tiers: in memory per session (keyed on path and mtime) and on disk in a Parquet
+sidecar next to each workbook, so an xlsx is parsed only once until it changes.
+"""
+
+import functools
+import os
+from typing import Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@functools.lru_cache(maxsize=None)
+def _detect_mean_column(columns: Sequence[str]) -> str:
+    if "mean_delay_s" in columns:
+        return "mean_delay_s"
+    if "mean_delta_s" in columns:
+        return "mean_delta_s"
+    raise SystemExit("Neither 'mean_delay_s' nor 'mean_delta_s' present in summary sheet")
+
+
+def _read_summary_rows(path: str) -> list:
+    """Return the rows of the 'summary' sheet (header first) as plain Python values.
+
+    Uses python-calamine when available and falls back to a read-only openpyxl
+    workbook otherwise.
+    """
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        pass
+    else:
+        return CalamineWorkbook.from_path(path).get_sheet_by_name("summary").to_python()
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return [list(row) for row in wb["summary"].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+def _as_float(value) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return np.nan
+
+
+def _read_summary_arrays(path: str, value_column: str = "value") -> Tuple[np.ndarray, np.ndarray]:
+    """Read (value × 2, mean delay) from the summary sheet as sorted float arrays.
+
+    Rows with non-numeric cells or a non-positive delay are dropped (log-scale safety).
+    """
+    rows = _read_summary_rows(path)
+    header = list(rows[0]) if rows else []
+    if value_column not in header:
+        raise SystemExit(f"Missing column '{value_column}' in summary of {path}")
+    vi = header.index(value_column)
+    mi = header.index(_detect_mean_column(tuple(header)))
+
+    data = rows[1:]
+    x = np.fromiter((_as_float(row[vi]) if len(row) > vi else np.nan for row in data), dtype=np.float64, count=len(data))
+    y = np.fromiter((_as_float(row[mi]) if len(row) > mi else np.nan for row in data), dtype=np.float64, count=len(data))
+
+    mask = np.isfinite(x) & np.isfinite(y) & (y > 0)
+    x = x[mask]
+    y = y[mask]
+    order = np.argsort(x, kind="stable")
+    return x[order] * 2.0, y[order]
+
+
+def _load_summary_arrays(path: str, value_column: str = "value") -> Tuple[np.ndarray, np.ndarray]:
+    """Return the summary arrays, using a Parquet sidecar cache next to the workbook.
+
+    The cache is reused while it is at least as new as the workbook, so the xlsx
+    is only parsed again after it changes.
+    """
+    cache = path + ".summary.parquet"
+    if os.path.exists(cache) and os.path.getmtime(path) <= os.path.getmtime(cache):
+        try:
+            df = pd.read_parquet(cache)
+            if list(df.columns) == [value_column, "delay_s"]:
+                return df[value_column].to_numpy(), df["delay_s"].to_numpy()
+        except Exception:
+            pass
+
+    x, y = _read_summary_arrays(path, value_column)
+    try:
+        pd.DataFrame({value_column: x, "delay_s": y}).to_parquet(cache, compression="zstd")
+    except Exception as exc:
+        print(f"Warning: could not write summary cache {cache}: {exc}")
+    return x, y
+
+
+@functools.lru_cache(maxsize=64)
+def load_xy(path: str, mtime: float, value_column: str = "value") -> Tuple[np.ndarray, np.ndarray]:
+    """Return the summary (x, y) arrays for a workbook; pass os.path.getmtime(path) as mtime.
+
+    The returned arrays are shared between callers and therefore read-only.
+    """
+    x, y = _load_summary_arrays(path, value_column)
+    x.flags.writeable = False
+    y.flags.writeable = False
+    return x, y
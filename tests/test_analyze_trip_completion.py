@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyze_trip_completion  # noqa: E402
+
+
+TRIPINFO_XML = """<?xml version="1.0" encoding="UTF-8"?>
+
+<!-- generated on 2024-01-01 00:00:00 by Eclipse SUMO sumo Version 1.19.0
+-->
+
+<tripinfos>
+    <tripinfo id="1" arrival="10.00" duration="5.00" vType="bus" vaporized=""/>
+    <tripinfo id="2" arrival="" duration="5.00" vType="bus"/>
+    <tripinfo id="3" arrival="10.00" duration="5.00" vType="car" vaporized="true"/>
+</tripinfos>
+"""
+
+
+def test_trips_missing_attributes_are_counted(tmp_path):
+    tripinfo_path = tmp_path / "tripinfo.xml"
+    tripinfo_path.write_text(TRIPINFO_XML, encoding="utf-8")
+
+    result = analyze_trip_completion.analyze_trip_completion_by_type(str(tripinfo_path))
+
+    assert result == (1, 1, 0, 1, 50.0, 0.0)
@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import create_delay_heatmaps  # noqa: E402
+
+
+NET_XML = """<?xml version="1.0" encoding="UTF-8"?>
+
+<!-- generated on 2024-01-01 00:00:00 by Eclipse SUMO netconvert Version 1.19.0
+-->
+
+<net version="1.16">
+    <location netOffset="0.00,0.00"/>
+    <edge id="e1" from="a" to="b">
+        <lane id="e1_0" index="0" speed="13.89" length="10.00" shape="1.00,2.00 3.00,4.00 5.00,6.00"/>
+    </edge>
+    <edge id="e2" from="b" to="c">
+        <lane id="e2_0" index="0" speed="13.89" length="10.00" shape="10.00,11.00 15.00,16.00"/>
+    </edge>
+    <junction id="a" type="priority" x="0.00" y="0.00"/>
+</net>
+"""
+
+STOPS_XML = """<?xml version="1.0" encoding="UTF-8"?>
+
+<!-- generated on 2024-01-01 00:00:00 by Eclipse SUMO gtfs2pt -->
+
+<additional>
+    <busStop id="s1" lane="e1_0" startPos="0" endPos="5"/>
+    <busStop id="s2" lane="e2_0" startPos="0" endPos="5"/>
+</additional>
+"""
+
+
+def test_parse_stop_locations_with_leading_comment(tmp_path):
+    net_path = tmp_path / "city_full.net.xml"
+    stops_path = tmp_path / "gtfs_publictransport.add.xml"
+    net_path.write_text(NET_XML, encoding="utf-8")
+    stops_path.write_text(STOPS_XML, encoding="utf-8")
+
+    stop_locations = create_delay_heatmaps.parse_stop_locations_from_xml(str(stops_path), str(net_path))
+
+    assert stop_locations == {"s1": (3.0, 4.0), "s2": (15.0, 16.0)}
+
+
+def test_empty_city_cache_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache_path = tmp_path / "empty.parquet"
+    key_path = tmp_path / "empty.json"
+    mtimes = {"ptstops": None, "network": None, "excel": None}
+    create_delay_heatmaps._save_city_cache(cache_path, key_path, mtimes, {}, {})
+
+    assert create_delay_heatmaps._load_city_cache(cache_path, key_path, mtimes) == ({}, {})